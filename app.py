@@ -1,10 +1,13 @@
 import streamlit as st
 import boto3
+from botocore.config import Config
+import base64
 import json
+import cv2
 import numpy as np
-from PIL import Image
 import io
 from datetime import datetime
+from textwrap import wrap
 
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -13,13 +16,33 @@ from reportlab.pdfgen import canvas
 # CONFIG
 # =========================
 
-# These fall back to sensible defaults if not set in st.secrets
-ENDPOINT_NAME = st.secrets.get("ENDPOINT_NAME", "pneumonia-detector-endpoint-v7")
-AWS_REGION = st.secrets.get("AWS_REGION", "ap-south-1")
+@st.cache_resource(show_spinner=False)
+def get_config() -> dict:
+    """
+    Endpoint / region settings, read from st.secrets once per process
+    instead of on every Streamlit rerun.
+
+    These fall back to sensible defaults if not set in st.secrets.
+
+    USE_IMAGE_BYTES_SIGNATURE: set to true only for an endpoint exported by
+    convert_to_savedmodel.py (it has the "serving_image_bytes" signature);
+    the app then sends the encoded file instead of a preprocessed tensor.
+    """
+    return {
+        "endpoint": st.secrets.get("ENDPOINT_NAME", "pneumonia-detector-endpoint-v7"),
+        "region": st.secrets.get("AWS_REGION", "ap-south-1"),
+        "image_bytes_signature": st.secrets.get("USE_IMAGE_BYTES_SIGNATURE", False) is True,
+    }
+
 
 # Image size used during training
 IMG_SIZE = (224, 224)
 
+# SageMaker caps real-time request bodies at 6 MB and base64 adds a third,
+# so encoded files above this are downscaled before being sent as bytes.
+MAX_IMAGE_BYTES = 4 * 1024 * 1024
+MAX_IMAGE_SIDE = 1024
+
 # Demo images included in the repo (relative paths)
 SAMPLE_IMAGES = {
     "Sample pneumonia case": "test_image.jpg",  # already in your repo root
@@ -31,6 +54,19 @@ SAMPLE_IMAGES = {
 # SAGEMAKER CLIENT
 # =========================
 
+# Shared by every Streamlit session: keep enough pooled keep-alive
+# connections that concurrent users don't pay a fresh TLS handshake.
+# read_timeout stays above SageMaker's 60 s invocation limit, so a slow
+# inference ends as a ModelError from the endpoint (not retried) instead
+# of being cut off client-side and re-sent by the retry policy.
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=70,
+    retries={"mode": "standard", "max_attempts": 3},
+)
+
 @st.cache_resource
 def get_sagemaker_runtime():
     """
@@ -40,24 +76,30 @@ def get_sagemaker_runtime():
     - On Streamlit Cloud: uses st.secrets["aws"]
     """
     aws_secrets = st.secrets.get("aws", None)
+    region = get_config()["region"]
 
     if aws_secrets:
         # Running on Streamlit Cloud – use secrets
         return boto3.client(
             "sagemaker-runtime",
-            region_name=aws_secrets.get("region", AWS_REGION),
+            region_name=aws_secrets.get("region", region),
             aws_access_key_id=aws_secrets["access_key_id"],
             aws_secret_access_key=aws_secrets["secret_access_key"],
+            config=BOTO_CONFIG,
         )
 
     # Local fallback – uses your local AWS config (~/.aws/credentials)
-    return boto3.client("sagemaker-runtime", region_name=AWS_REGION)
+    return boto3.client(
+        "sagemaker-runtime", region_name=region, config=BOTO_CONFIG
+    )
 
 
 # =========================
 # PDF REPORT BUILDER
 # =========================
 
+_A4_H = A4[1]
+
 def build_pdf_report(
     patient_id: str,
     diagnosis_label: str,
@@ -70,69 +112,52 @@ def build_pdf_report(
     """
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
+
+    # All lines go into one text object (single BT/ET block) instead of a
+    # separate drawString per line. Leading = gap to the next line.
+    t = c.beginText(50, _A4_H - 50)
 
     # Title
-    y = height - 50
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, y, "AI-Powered Chest X-Ray Screening Report")
+    t.setFont("Helvetica-Bold", 16, 30)
+    t.textLine("AI-Powered Chest X-Ray Screening Report")
 
     # Timestamp
-    y -= 30
-    c.setFont("Helvetica", 10)
-    c.drawString(
-        50,
-        y,
-        f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-    )
+    t.setFont("Helvetica", 10, 40)
+    t.textLine(f"Generated at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     # Patient / study info
-    y -= 40
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Patient / Study Info")
-    c.setFont("Helvetica", 10)
-    y -= 18
-    c.drawString(50, y, f"Patient / Study ID: {patient_id or 'N/A'}")
-    y -= 18
-    c.drawString(50, y, f"Model: {model_name}")
+    t.setFont("Helvetica-Bold", 12, 18)
+    t.textLine("Patient / Study Info")
+    t.setFont("Helvetica", 10, 18)
+    t.textLine(f"Patient / Study ID: {patient_id or 'N/A'}")
+    t.setLeading(30)
+    t.textLine(f"Model: {model_name}")
 
     # AI assessment
-    y -= 30
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "AI Assessment")
-    c.setFont("Helvetica", 10)
-    y -= 18
-    c.drawString(50, y, f"Diagnosis: {diagnosis_label}")
-    y -= 18
-    c.drawString(50, y, f"Model probability (pneumonia): {probability:.3f}")
+    t.setFont("Helvetica-Bold", 12, 18)
+    t.textLine("AI Assessment")
+    t.setFont("Helvetica", 10, 18)
+    t.textLine(f"Diagnosis: {diagnosis_label}")
+    t.setLeading(30)
+    t.textLine(f"Model probability (pneumonia): {probability:.3f}")
 
     # Notes (wrapped)
-    y -= 30
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, "Notes")
-    c.setFont("Helvetica", 10)
-    y -= 18
-
-    wrapped = []
-    line = ""
+    t.setFont("Helvetica-Bold", 12, 18)
+    t.textLine("Notes")
+    t.setFont("Helvetica", 10, 14)
+
     max_chars = 90
-    for word in (notes or "").split():
-        if len(line) + len(word) + 1 > max_chars:
-            wrapped.append(line)
-            line = word
-        else:
-            line += (" " if line else "") + word
-    if line:
-        wrapped.append(line)
+    wrapped = wrap(notes or "", width=max_chars)
 
     for ln in wrapped:
-        c.drawString(50, y, ln)
-        y -= 14
-        if y < 60:
+        t.textLine(ln)
+        if t.getY() < 60:
+            c.drawText(t)
             c.showPage()
-            y = height - 60
-            c.setFont("Helvetica", 10)
+            t = c.beginText(50, _A4_H - 60)
+            t.setFont("Helvetica", 10, 14)
 
+    c.drawText(t)
     c.showPage()
     c.save()
     buffer.seek(0)
@@ -143,18 +168,86 @@ def build_pdf_report(
 # IMAGE PREPROCESSING
 # =========================
 
-def preprocess_image(image: Image.Image) -> bytes:
+def _rescale_u8_to_f32(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Fused uint8 → float32 rescale to [0, 1], written straight into dst.
+    """
+    np.multiply(src, np.float32(1.0 / 255.0), out=dst, dtype=np.float32)
+    return dst
+
+
+def preprocess_image(image_bytes: bytes) -> bytes:
     """
-    Convert PIL image → normalized numpy array → JSON bytes
+    Decode JPEG/PNG bytes → normalized numpy array → JSON bytes
     suitable for the SageMaker TensorFlow endpoint.
     """
-    image = image.convert("RGB")
-    image = image.resize(IMG_SIZE)
-    img_array = np.array(image) / 255.0
-    img_array = np.expand_dims(img_array, axis=0)  # shape (1, H, W, 3)
+    # IMREAD_COLOR always yields 3-channel uint8 BGR (grayscale X-rays
+    # included); EXIF orientation is ignored, as the old PIL decode did.
+    image = cv2.imdecode(
+        np.frombuffer(image_bytes, dtype=np.uint8),
+        cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION,
+    )
+    if image is None:
+        raise ValueError("Could not decode the image file")
+    # INTER_AREA averages source pixels when downscaling, so large X-rays
+    # don't alias (INTER_LINEAR would); stays close to the old PIL resize.
+    resized = cv2.resize(image, IMG_SIZE, interpolation=cv2.INTER_AREA)
+    # Write into the batch slot directly instead of expand_dims afterwards;
+    # the reversed channel view turns BGR into RGB within the same pass.
+    img_array = np.empty((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+    _rescale_u8_to_f32(resized[..., ::-1], img_array[0])  # shape (1, H, W, 3)
     return json.dumps(img_array.tolist()).encode("utf-8")
 
 
+def encode_image_request(image_bytes: bytes) -> bytes:
+    """
+    Wrap the encoded image as a TF Serving b64 instance for the
+    "serving_image_bytes" signature (decode/resize/rescale run in-graph).
+    """
+    if len(image_bytes) > MAX_IMAGE_BYTES:
+        image = cv2.imdecode(
+            np.frombuffer(image_bytes, dtype=np.uint8),
+            cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION,
+        )
+        if image is None:
+            raise ValueError("Could not decode the image file")
+        scale = MAX_IMAGE_SIDE / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        # Lossless re-encode; 1024x1024x3 PNG stays well under MAX_IMAGE_BYTES
+        ok, encoded = cv2.imencode(".png", image)
+        if not ok:
+            raise ValueError("Could not re-encode the image file")
+        image_bytes = encoded.tobytes()
+
+    payload = {
+        "signature_name": "serving_image_bytes",
+        "instances": [{"b64": base64.b64encode(image_bytes).decode("ascii")}],
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+# Bounded: entries are JSON payloads of up to ~6 MB, shared by all sessions
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def prepare_payload(image_bytes: bytes) -> bytes:
+    """
+    Decode + preprocess an image file, cached on its bytes so diagnosing
+    the same image again skips the decode/resize/JSON work.
+    """
+    if get_config()["image_bytes_signature"]:
+        return encode_image_request(image_bytes)
+    return preprocess_image(image_bytes)
+
+
+@st.cache_data(show_spinner=False)
+def load_sample(path: str) -> bytes:
+    """
+    Read a bundled demo image from disk once; later reruns reuse the bytes.
+    """
+    with open(path, "rb") as f:
+        return f.read()
+
+
 # =========================
 # MODEL INVOKE
 # =========================
@@ -165,7 +258,7 @@ def invoke_model(image_bytes: bytes) -> float:
     """
     client = get_sagemaker_runtime()
     response = client.invoke_endpoint(
-        EndpointName=ENDPOINT_NAME,
+        EndpointName=get_config()["endpoint"],
         ContentType="application/json",
         Body=image_bytes,
     )
@@ -178,16 +271,15 @@ def invoke_model(image_bytes: bytes) -> float:
 # DIAGNOSIS LOGIC
 # =========================
 
+# Indexed by how many thresholds (0.5, 0.75) the probability reaches
+_LABELS = ("Normal", "Possible Pneumonia (Moderate)", "Pneumonia Detected")
+
+
 def map_probability(prob: float) -> str:
     """
     Map probability → human-friendly diagnosis label.
     """
-    if prob >= 0.75:
-        return "Pneumonia Detected"
-    elif prob >= 0.5:
-        return "Possible Pneumonia (Moderate)"
-    else:
-        return "Normal"
+    return _LABELS[int(prob >= 0.5) + int(prob >= 0.75)]
 
 
 # =========================
@@ -212,7 +304,7 @@ def main():
 
     patient_id = st.text_input("Patient / Study ID (optional)")
 
-    image = None
+    image_bytes = None
 
     if mode == "Upload image":
         uploaded_file = st.file_uploader(
@@ -221,26 +313,26 @@ def main():
         )
 
         if uploaded_file is not None:
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Uploaded X-ray", use_column_width=True)
+            # Read once; the same encoded bytes feed the preview and the model
+            image_bytes = uploaded_file.getvalue()
+            st.image(image_bytes, caption="Uploaded X-ray", use_column_width=True)
 
     else:  # Use demo sample
         sample_name = st.selectbox("Choose demo X-ray", list(SAMPLE_IMAGES.keys()))
         image_path = SAMPLE_IMAGES[sample_name]
 
         try:
-            image = Image.open(image_path)
-            st.image(image, caption=f"Demo: {sample_name}", use_column_width=True)
+            image_bytes = load_sample(image_path)
+            st.image(image_bytes, caption=f"Demo: {sample_name}", use_column_width=True)
             st.info("You are running the model in **demo mode** using a sample image.")
         except FileNotFoundError:
             st.error(f"Demo image not found at: {image_path}")
-            image = None
 
     # --- Run model if we have an image ---
-    if image is not None and st.button("Run AI Diagnosis"):
+    if image_bytes is not None and st.button("Run AI Diagnosis"):
         with st.spinner("Analyzing using SageMaker model..."):
             try:
-                payload = preprocess_image(image)
+                payload = prepare_payload(image_bytes)
                 prob = invoke_model(payload)
                 diagnosis = map_probability(prob)
 
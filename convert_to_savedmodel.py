@@ -33,7 +33,47 @@ if saved_dir.exists():
 print("Loading model...")
 model = tf.keras.models.load_model(str(h5_path))
 
+IMG_SIZE = (224, 224)
+OUTPUT_NAME = model.output_names[0]  # keep the response key callers see today
+
+
+@tf.function(
+    input_signature=[tf.TensorSpec([None, *IMG_SIZE, 3], tf.float32, name="input_2")]
+)
+def serve_tensor(images):
+    """Preprocessed (N, 224, 224, 3) float32 batch, as before."""
+    return {OUTPUT_NAME: model(images, training=False)}
+
+
+def _decode_and_resize(image_bytes):
+    # decode_image doesn't apply EXIF rotation, matching the cv2 decode in
+    # app.py / inference.py (IMREAD_IGNORE_ORIENTATION).
+    img = tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+    # "area" is the same box-filter downscale as cv2.INTER_AREA used by
+    # app.py preprocess_image and inference.py _preprocess.
+    img = tf.image.resize(img, IMG_SIZE, method="area")  # float32
+    return img / 255.0
+
+
+# Reached through TF Serving's JSON API (application/json), as app.py sends
+# it when USE_IMAGE_BYTES_SIGNATURE is set:
+#   {"signature_name": "serving_image_bytes",
+#    "instances": [{"b64": "<base64 JPEG/PNG>"}]}
+@tf.function(input_signature=[tf.TensorSpec([None], tf.string, name="image_bytes")])
+def serve_image_bytes(image_bytes):
+    """Raw JPEG/PNG bytes; decode, resize and rescale run inside the graph."""
+    images = tf.map_fn(_decode_and_resize, image_bytes, fn_output_signature=tf.float32)
+    return {OUTPUT_NAME: model(images, training=False)}
+
+
 print("Saving SavedModel...")
-tf.saved_model.save(model, str(saved_dir))
+tf.saved_model.save(
+    model,
+    str(saved_dir),
+    signatures={
+        "serving_default": serve_tensor,
+        "serving_image_bytes": serve_image_bytes,
+    },
+)
 
 print("SavedModel created at:", saved_dir)
@@ -1,21 +1,40 @@
-import io
 import json
+import cv2
 import numpy as np
-from PIL import Image
 import tensorflow as tf
 
 IMG_SIZE = (224, 224)
 
+# Scratch buffer for the resize step, reused across requests. It is only
+# read inside _preprocess, which always returns a fresh batch array, so the
+# one assumption is that a worker process never runs _preprocess from two
+# threads at once.
+_RESIZE_BUF = np.empty((IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+
 def model_fn(model_dir):
     """Loads the Keras model inside SageMaker."""
     model = tf.keras.models.load_model(f"{model_dir}/model.h5", compile=False)
     return model
 
+def _rescale_u8_to_f32(src, dst):
+    """Fused uint8 -> float32 rescale to [0, 1], written straight into dst."""
+    np.multiply(src, np.float32(1.0 / 255.0), out=dst, dtype=np.float32)
+    return dst
+
 def _preprocess(image_bytes):
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize(IMG_SIZE)
-    arr = np.array(img, dtype=np.float32) / 255.0
-    arr = np.expand_dims(arr, axis=0)
+    # IMREAD_COLOR always yields 3-channel uint8 BGR (grayscale X-rays included);
+    # ignore EXIF orientation like the previous PIL decode did.
+    img = cv2.imdecode(
+        np.frombuffer(image_bytes, dtype=np.uint8),
+        cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION,
+    )
+    if img is None:
+        raise ValueError("Could not decode image payload")
+    resized = cv2.resize(img, IMG_SIZE, dst=_RESIZE_BUF, interpolation=cv2.INTER_AREA)
+    # Write into the batch slot directly instead of expand_dims afterwards;
+    # the reversed channel view turns BGR into RGB within the same pass.
+    arr = np.empty((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+    _rescale_u8_to_f32(resized[..., ::-1], arr[0])
     return arr
 
 def input_fn(request_body, content_type):
@@ -1,8 +1,14 @@
 import json
+import cv2
 import numpy as np
 from PIL import Image
 import boto3
 
+try:
+    import orjson  # optional, not in requirements.txt: pip install orjson
+except ImportError:
+    orjson = None
+
 # ===== CONFIG =====
 ENDPOINT_NAME = "pneumonia-detector-endpoint-v7"
 REGION = "ap-south-1"
@@ -12,22 +18,26 @@ IMG_SIZE = (224, 224)           # <-- use the same size you used in training
 
 def preprocess_image(path):
     img = Image.open(path).convert("RGB")
-    img = img.resize(IMG_SIZE)
-    arr = np.array(img).astype("float32") / 255.0  # same normalization as training
+    arr = cv2.resize(np.asarray(img), IMG_SIZE, interpolation=cv2.INTER_AREA)
+    arr = np.multiply(arr, np.float32(1.0 / 255.0), dtype=np.float32)  # same normalization as training
     arr = np.expand_dims(arr, axis=0)             # shape: (1, H, W, 3)
     return arr
 
 def main():
     # 1) Preprocess locally
     x = preprocess_image(IMAGE_PATH)
-    payload = {"instances": x.tolist()}  # TF Serving format
+    # TF Serving format; orjson walks the ndarray buffer directly (no tolist())
+    if orjson is not None:
+        body = orjson.dumps({"instances": x}, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps({"instances": x.tolist()})
 
     # 2) Call SageMaker endpoint
     runtime = boto3.client("sagemaker-runtime", region_name=REGION)
     response = runtime.invoke_endpoint(
         EndpointName=ENDPOINT_NAME,
         ContentType="application/json",
-        Body=json.dumps(payload),
+        Body=body,
     )
 
     result = response["Body"].read().decode("utf-8")